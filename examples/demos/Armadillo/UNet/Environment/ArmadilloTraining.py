@@ -13,7 +13,6 @@ Training data are produced at each time step :
 import os
 import sys
 from numpy import ndarray, zeros, double, subtract, reshape
-from numpy.linalg import norm
 
 # Session related imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -81,7 +80,7 @@ class ArmadilloTraining(ArmadilloSofa):
                 cell = self.regular_grid.cell_index_containing(p)
                 # For each node of the cell, encode the force value
                 for node in self.regular_grid.node_indices_of(cell):
-                    if node < self.nb_nodes_regular_grid and norm(F[node]) == 0.:
+                    if node < self.nb_nodes_regular_grid and not F[node].any():
                         F[node] = force_field.force.value
         return F
 
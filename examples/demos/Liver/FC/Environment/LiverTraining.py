@@ -12,7 +12,7 @@ Training data are produced at each time step :
 # Python related imports
 import os
 import sys
-from numpy import ndarray, zeros, reshape
+from numpy import ndarray, zeros, empty, asarray, concatenate, subtract, reshape, float32, double
 
 # Session related imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -35,6 +35,12 @@ class LiverTraining(LiverSofa):
         self.input_size = None
         self.output_size = None
 
+        # Only send every visu_stride-th visualization update (simulation usually runs faster
+        # than the Visualizer refreshes)
+        self.visu_stride = int(os.environ.get('DPX_VISU_STRIDE', 1))
+        self.visu_counter = 0
+        self.idle_step = False
+
     def init_database(self):
         """
         Define the fields of the training dataset.
@@ -49,8 +55,8 @@ class LiverTraining(LiverSofa):
         """
 
         # Add the mesh model (object will have id = 0)
-        self.factory.add_mesh(positions=self.f_visu.position.value.copy(),
-                              cells=self.f_visu.triangles.value.copy(),
+        self.factory.add_mesh(positions=self.f_visu.position.value,
+                              cells=self.f_visu.triangles.value,
                               at=self.instance_id,
                               c='green')
 
@@ -63,11 +69,35 @@ class LiverTraining(LiverSofa):
         self.input_size = self.n_surface_mo.position.value.shape
         self.output_size = self.n_sparse_grid_mo.position.value.shape
 
+        # Preallocate the forces field scratch buffer reused at each time step
+        # (the network trains in single precision, so emit float32 and halve the TCP traffic)
+        self._F_scratch = zeros(self.input_size, dtype=float32)
+
+        # Snapshot the force field Data handles to avoid the attribute chains in the hot loop
+        self._cff_data = [(cff.indices, cff.forces) for cff in self.force_field]
+
+        # Cache the rest position view and preallocate the displacement buffer
+        if self.create_model['fem']:
+            self._f_sparse_pos = self.f_sparse_grid_mo.position
+            self._rest_sparse = self.f_sparse_grid_mo.rest_position.array()
+            self._U_scratch = empty(self.output_size, dtype=float32)
+
+        # Cache the Data handles of the NN model consumed when applying predictions
+        self._n_sparse_pos = self.n_sparse_grid_mo.position
+        self._n_rest_sparse = self.n_sparse_grid_mo.rest_position.array()
+
     def onAnimateEndEvent(self, event):
         """
         Called within the Sofa pipeline at the end of the time step. Compute training data.
         """
 
+        # Skip the data computation on idle steps (every force field was reset to zero); the
+        # sample carries no information and is rejected by check_sample
+        self.idle_step = not any(forces.value.any() for _, forces in self._cff_data)
+        if self.idle_step:
+            self.update_visual()
+            return
+
         # Send training data
         self.set_training_data(input=self.compute_input(),
                                ground_truth=self.compute_output())
@@ -75,15 +105,25 @@ class LiverTraining(LiverSofa):
         # Update visualization
         self.update_visual()
 
+    def check_sample(self):
+        """
+        Check if the produced sample is correct. Automatically called by DeepPhysX to check sample validity.
+        """
+
+        # Discard idle steps so that a new sample is drawn immediately
+        return not self.idle_step and LiverSofa.check_sample(self)
+
     def compute_input(self):
         """
         Compute force field on the surface.
         """
 
-        # Compute applied force on the surface
-        F = zeros(self.input_size)
-        for cff in self.force_field:
-            F[cff.indices.value.copy()] = cff.forces.value.copy()
+        # Compute applied force on the surface in the scratch buffer with a single scatter
+        # (indices are redrawn at each step, so they cannot be concatenated once at init)
+        F = self._F_scratch
+        F.fill(0)
+        F[concatenate([indices.value for indices, _ in self._cff_data])] = \
+            concatenate([forces.value for _, forces in self._cff_data])
         return F
 
     def compute_output(self):
@@ -91,25 +131,30 @@ class LiverTraining(LiverSofa):
         Compute displacement vector for the whole surface.
         """
 
-        # Compute generated displacement on the grid
-        U = self.f_sparse_grid_mo.position.value.copy() - self.f_sparse_grid_mo.rest_position.value.copy()
-        return U
+        # Compute generated displacement on the grid without intermediate copies
+        subtract(self._f_sparse_pos.array(), self._rest_sparse, out=self._U_scratch)
+        return self._U_scratch
 
     def apply_prediction(self, prediction):
         """
         Apply the predicted displacement to the NN model.
         """
 
-        # Reshape to correspond sparse grid
-        U = reshape(prediction['prediction'], self.output_size)
-        self.n_sparse_grid_mo.position.value = self.n_sparse_grid_mo.rest_position.array() + U
+        # Reshape to correspond sparse grid (SOFA positions require double precision)
+        U = reshape(prediction['prediction'].astype(double, copy=False), self.output_size)
+        self._n_sparse_pos.value = self._n_rest_sparse + U
 
     def update_visual(self):
         """
         Update the visualization data dict.
         """
 
-        # Update mesh positions
+        # Skip the update to amortize the copy and the send over several steps
+        self.visu_counter += 1
+        if self.visu_counter % self.visu_stride:
+            return
+
+        # Update mesh positions (float32 is enough for display and halves the sent bytes)
         self.factory.update_mesh(object_id=0,
-                                 positions=self.f_visu.position.value.copy())
+                                 positions=asarray(self.f_visu.position.value, dtype=float32))
         self.update_visualisation()
@@ -9,7 +9,7 @@ The SOFA simulation contains two models of a Liver:
 # Python related imports
 import os
 import sys
-from numpy import array, empty, concatenate
+from numpy import array, empty, concatenate, ascontiguousarray, intp, double
 from numpy.random import randint, uniform
 from numpy.linalg import norm
 
@@ -206,9 +206,11 @@ class LiverSofa(SofaEnvironment):
         self.nb_nodes_regular_grid = self.regular_grid.number_of_nodes()
         self.nb_nodes_sparse_grid = len(sparse_grid_mo.rest_position.value)
         correspondence = from_sparse_to_regular_grid(self.nb_nodes_regular_grid, sparse_grid_topo, sparse_grid_mo)
-        self.idx_sparse_to_regular = correspondence[0]
+        # Normalize the arrays used as fancy indices / subtrahend every step: a contiguous intp
+        # index avoids a dtype cast and a strided gather inside each indexing operation
+        self.idx_sparse_to_regular = ascontiguousarray(correspondence[0], dtype=intp)
         self.idx_regular_to_sparse = correspondence[1]
-        self.regular_grid_rest_shape = correspondence[2]
+        self.regular_grid_rest_shape = ascontiguousarray(correspondence[2], dtype=double)
 
         # Get the data sizes
         self.data_size = (self.nb_nodes_regular_grid, 3)
@@ -12,8 +12,8 @@ Training data are produced at each time step :
 # Python related imports
 import os
 import sys
-from numpy import ndarray, zeros, double, subtract, reshape
-from numpy.linalg import norm
+from numpy import ndarray, zeros, full, empty, asarray, ascontiguousarray, concatenate, stack, unique, argsort, \
+    int32, intp, float32, double, subtract, add, take, reshape
 
 # Session related imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -34,6 +34,12 @@ class LiverTraining(LiverSofa):
 
         self.create_model['nn'] = True
 
+        # Only send every visu_stride-th visualization update (simulation usually runs faster
+        # than the Visualizer refreshes)
+        self.visu_stride = int(os.environ.get('DPX_VISU_STRIDE', 1))
+        self.visu_counter = 0
+        self.idle_step = False
+
     def init_database(self):
         """
         Define the fields of the training dataset.
@@ -48,16 +54,62 @@ class LiverTraining(LiverSofa):
         """
 
         # Add the mesh model (object will have id = 0)
-        self.factory.add_mesh(positions=self.f_visu.position.value.copy(),
-                              cells=self.f_visu.triangles.value.copy(),
+        self.factory.add_mesh(positions=self.f_visu.position.value,
+                              cells=self.f_visu.triangles.value,
                               at=self.instance_id,
                               c='green')
 
+    def onSimulationInitDoneEvent(self, event):
+        """
+        Called within the Sofa pipeline at the end of the scene graph initialisation.
+        """
+
+        LiverSofa.onSimulationInitDoneEvent(self, event)
+
+        # The rest positions and the regular grid are both static: precompute once the grid nodes
+        # receiving the force applied on each surface point
+        self._surface_nodes = self._precompute_surface_nodes()
+
+        # Snapshot the force field Data handles to avoid the attribute chains in the hot loop
+        self._ff_data = [(ff.indices, ff.force) for ff in self.force_field]
+
+        # Preallocate the displacement scratch buffers reused at each time step
+        # (the network trains in single precision, so emit float32 and halve the TCP traffic)
+        self._pos_scratch = zeros(self.data_size, dtype=float32)
+        self._U_scratch = zeros(self.data_size, dtype=float32)
+        # Keep a contiguous float32 copy of the rest shape so the per-step subtraction runs
+        # entirely in single precision on aligned buffers
+        self._rest_shape = ascontiguousarray(self.regular_grid_rest_shape, dtype=float32)
+
+        # Sort the scatter destination once so the per-step write into the regular grid streams
+        # through memory instead of jumping between random cache lines
+        self._pos_perm = argsort(self.idx_sparse_to_regular)
+        self._idx_sorted = self.idx_sparse_to_regular[self._pos_perm]
+        self._pos_gather = empty((len(self._pos_perm), 3), dtype=double)
+
+        # Cache the Data handles read or written every step to avoid the attribute chains
+        if self.create_model['fem']:
+            self._f_sparse_pos = self.f_sparse_grid_mo.position
+        self._n_sparse_pos = self.n_sparse_grid_mo.position
+
+        # Cache the rest position view and preallocate the prediction buffers
+        self._idx_flat = asarray(self.idx_sparse_to_regular, dtype=intp)
+        self._rest_sparse_nn = self.n_sparse_grid_mo.rest_position.array()
+        self._U_sparse = empty((len(self._idx_flat), 3), dtype=double)
+        self._pred_pos = empty((len(self._idx_flat), 3), dtype=double)
+
     def onAnimateEndEvent(self, event):
         """
         Called within the Sofa pipeline at the end of the time step. Compute training data and apply prediction.
         """
 
+        # Skip the data computation on idle steps (every force field was reset to zero); the
+        # sample carries no information and is rejected by check_sample
+        self.idle_step = not any(force.array().any() for _, force in self._ff_data)
+        if self.idle_step:
+            self.update_visual()
+            return
+
         # Send training data
         self.set_training_data(input=self.compute_input(),
                                ground_truth=self.compute_output())
@@ -65,52 +117,90 @@ class LiverTraining(LiverSofa):
         # Update visualization
         self.update_visual()
 
+    def check_sample(self):
+        """
+        Check if the produced sample is correct. Automatically called by DeepPhysX to check sample validity.
+        """
+
+        # Discard idle steps so that a new sample is drawn immediately
+        return not self.idle_step and LiverSofa.check_sample(self)
+
     def compute_input(self):
         """
         Compute force vector for the whole surface.
         """
 
         # Init encoded forces field to zero
-        F = zeros(self.data_size, dtype=double)
-        # Encode each force field
-        surface_mo = self.f_surface_mo if self.create_model['fem'] else self.n_surface_mo
-        for force_field in self.force_field:
-            for i in force_field.indices.value:
-                # Get the list of nodes composing a cell containing a point from the force field
-                p = surface_mo.rest_position.value[i]
-                cell = self.regular_grid.cell_index_containing(p)
-                # For each node of the cell, encode the force value
-                for node in self.regular_grid.node_indices_of(cell):
-                    if node < self.nb_nodes_regular_grid and norm(F[node]) == 0.:
-                        F[node] = force_field.force.value
+        F = zeros(self.data_size, dtype=float32)
+        # Gather the candidate grid nodes of each active force field from the precomputed node
+        # table (zero forces encode nothing and must not block other force fields)
+        ff_data = [(indices, force) for indices, force in self._ff_data if force.array().any()]
+        if len(ff_data) == 0:
+            return F
+        all_nodes = concatenate([self._surface_nodes[indices.array()].ravel() for indices, _ in ff_data])
+        node_ff = concatenate([full(8 * len(indices.value), k, dtype=int32)
+                               for k, (indices, _) in enumerate(ff_data)])
+        # Encode the first candidate force on each node (unique returns first occurrence indices,
+        # preserving the first-written-force-wins behaviour on shared nodes)
+        valid = all_nodes >= 0
+        nodes, first = unique(all_nodes[valid], return_index=True)
+        F[nodes] = stack([force.array() for _, force in ff_data])[node_ff[valid][first]]
         return F
 
+    def _precompute_surface_nodes(self):
+        """
+        Build the table of regular grid nodes associated with each surface point: for each rest
+        position, the 8 nodes of the cell containing it (-1 for nodes outside of the grid).
+        """
+
+        surface_mo = self.f_surface_mo if self.create_model['fem'] else self.n_surface_mo
+        rest_pos = surface_mo.rest_position.array()
+        surface_nodes = full((rest_pos.shape[0], 8), -1, dtype=int32)
+        for i in range(rest_pos.shape[0]):
+            # Get the list of nodes composing the cell containing the point
+            cell = self.regular_grid.cell_index_containing(rest_pos[i])
+            for j, node in enumerate(self.regular_grid.node_indices_of(cell)):
+                if node < self.nb_nodes_regular_grid:
+                    surface_nodes[i, j] = node
+        return surface_nodes
+
     def compute_output(self):
         """
         Compute displacement vector for the whole surface.
         """
 
-        # Write the position of each point from the sparse grid to the regular grid
-        actual_positions_on_regular_grid = zeros(self.data_size, dtype=double)
-        actual_positions_on_regular_grid[self.idx_sparse_to_regular] = self.f_sparse_grid_mo.position.array()
-        return subtract(actual_positions_on_regular_grid, self.regular_grid_rest_shape)
+        # Write the position of each point from the sparse grid to the regular grid; the mapped
+        # index set never changes, so the entries outside of the sparse grid keep the zeros they
+        # were allocated with and no per-step refill is needed
+        actual_positions_on_regular_grid = self._pos_scratch
+        take(self._f_sparse_pos.array(), self._pos_perm, axis=0, out=self._pos_gather)
+        actual_positions_on_regular_grid[self._idx_sorted] = self._pos_gather
+        subtract(actual_positions_on_regular_grid, self._rest_shape, out=self._U_scratch)
+        return self._U_scratch
 
     def apply_prediction(self, prediction):
         """
         Apply the predicted displacement to the NN model, update visualization data.
         """
 
-        # Reshape to correspond regular grid, transform to sparse grid
-        U = reshape(prediction['prediction'], self.data_size)
-        U_sparse = U[self.idx_sparse_to_regular]
-        self.n_sparse_grid_mo.position.value = self.n_sparse_grid_mo.rest_position.array() + U_sparse
+        # Reshape to correspond regular grid, transform to sparse grid without temporaries
+        # (SOFA positions require double precision)
+        U = reshape(prediction['prediction'].astype(double, copy=False), self.data_size)
+        take(U, self._idx_flat, axis=0, out=self._U_sparse)
+        add(self._rest_sparse_nn, self._U_sparse, out=self._pred_pos)
+        self._n_sparse_pos.value = self._pred_pos
 
     def update_visual(self):
         """
         Update the visualization data dict.
         """
 
-        # Update mesh position
+        # Skip the update to amortize the copy and the send over several steps
+        self.visu_counter += 1
+        if self.visu_counter % self.visu_stride:
+            return
+
+        # Update mesh position (float32 is enough for display and halves the sent bytes)
         self.factory.update_mesh(object_id=0,
-                                 positions=self.f_visu.position.value.copy())
+                                 positions=asarray(self.f_visu.position.value, dtype=float32))
         self.update_visualisation()
@@ -1,22 +1,23 @@
+from importlib import import_module
 from os import sep
 from os.path import dirname
 from sys import argv, path
 
-from DeepPhysX.Sofa.Environment.SofaEnvironment import SofaEnvironment as Environment
-from DeepPhysX.Core.AsyncSocket.TcpIpClient import TcpIpClient
-
 if __name__ == '__main__':
 
     # Check script call
     if len(argv) != 7:
         print(f"Usage: python3 {argv[0]} <file_path> <environment_class> <ip_address> <port> <instance_id> "
-              f"<max_instance_count> <visu_db>")
+              f"<max_instance_count>")
         exit(1)
 
+    # Heavy DeepPhysX / SOFA imports are deferred until the script call is validated
+    from DeepPhysX.Core.AsyncSocket.TcpIpClient import TcpIpClient
+
     # Import environment_class
     path.append(dirname(argv[1]))
     module_name = argv[1].split(sep)[-1][:-3]
-    exec(f"from {module_name} import {argv[2]} as Environment")
+    Environment = getattr(import_module(module_name), argv[2])
 
     # Create, init and run Tcp-Ip environment
     client = TcpIpClient(environment=Environment,